@@ -1,5 +1,8 @@
 import streamlit as st
 import os
+import logging
+import threading
+import time
 from dotenv import load_dotenv
 from pinecone import Pinecone
 import google.generativeai as genai
@@ -12,17 +15,155 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 INDEX_NAME = os.getenv("INDEX_NAME", "rag-chatbot")
 
+# Retrieval tuning
+MAX_TOP_K = int(os.getenv("MAX_TOP_K", "5"))
+# Higher score must mean more similar: only valid for cosine/dotproduct indexes,
+# a euclidean index would have every relevant match dropped by this cutoff
+MIN_SCORE = float(os.getenv("MIN_SCORE", "0.35"))  # absolute cosine similarity cutoff
+MAX_SCORE_GAP = float(os.getenv("MAX_SCORE_GAP", "0.1"))  # stop at a drop this large between neighbours
+
+# Connection tuning
+PINECONE_USE_GRPC = os.getenv("PINECONE_USE_GRPC", "false").lower() == "true"
+# Unset keeps the SDK's own default (cpu_count * 5); set it to match expected concurrent sessions
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE")) if os.getenv("PINECONE_POOL_SIZE") else None
+GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT", "grpc")  # "grpc" or "rest"
+SHOW_CONNECTION_STATS = os.getenv("SHOW_CONNECTION_STATS", "false").lower() == "true"  # operators only
+
+NO_CONTEXT_REPLY = "I don't have that specific information about Soham right now. Feel free to ask me something else! ✨"
+
+# Streamlit leaves the root logger at WARNING, so configure ours explicitly.
+# The script is re-executed on every rerun; only attach the handler once.
+logger = logging.getLogger("personal_assistant")
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.propagate = False
+
+# An unknown LOG_LEVEL shouldn't take the app down; fall back to INFO
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+if isinstance(logging.getLevelName(LOG_LEVEL), int):
+    logger.setLevel(LOG_LEVEL)
+else:
+    logger.setLevel(logging.INFO)
+    logger.warning(f"Unknown LOG_LEVEL '{LOG_LEVEL}', using INFO")
+
+# Cached so the stats survive reruns and are shared across sessions, like the clients themselves
+@st.cache_resource
+def get_connection_stats():
+    """Return the process-wide connection stats and the lock guarding them"""
+    stats = {
+        "transport": None,
+        "pool_size": None,
+        "warmup_status": "pending",
+        "warmup_ms": None,
+        "queries": 0,
+        "first_query_ms": None,
+        "avg_query_ms": None,
+    }
+    return stats, threading.Lock()
+
+def create_pinecone_client(stats, lock):
+    """Create a gRPC or pooled HTTP Pinecone client and its index handle"""
+    if PINECONE_USE_GRPC:
+        try:
+            from pinecone.grpc import PineconeGRPC
+            pc = PineconeGRPC(api_key=PINECONE_API_KEY)
+            with lock:
+                stats["transport"] = "grpc"
+            return pc, pc.Index(INDEX_NAME)
+        except ImportError:
+            logger.warning("pinecone[grpc] is not installed, falling back to HTTP client")
+    
+    # HTTP client keeps connections alive; only override the pool size when asked to
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    index_kwargs = {}
+    if PINECONE_POOL_SIZE:
+        index_kwargs["connection_pool_maxsize"] = PINECONE_POOL_SIZE
+    index = pc.Index(INDEX_NAME, **index_kwargs)
+    
+    # Report the size the client actually uses rather than what was requested
+    pool_manager = get_pool_manager(index)
+    pool_size = pool_manager.connection_pool_kw.get("maxsize") if pool_manager else PINECONE_POOL_SIZE
+    with lock:
+        stats["transport"] = "http"
+        stats["pool_size"] = pool_size
+    return pc, index
+
+def warm_up_connections(index, stats, lock):
+    """Open Pinecone and Gemini connections ahead of the first user query"""
+    start = time.perf_counter()
+    try:
+        index.describe_index_stats()
+        genai.embed_content(
+            model='models/text-embedding-004',
+            content="warm-up",
+            task_type="retrieval_query"
+        )
+        status = "done"
+    except Exception as e:
+        logger.warning(f"Connection warm-up failed: {e}")
+        status = "failed"
+    with lock:
+        stats["warmup_status"] = status
+        stats["warmup_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+def record_query_latency(elapsed_ms, stats, lock):
+    """Track Pinecone query latency so connection reuse can be observed"""
+    with lock:
+        count = stats["queries"]
+        if count == 0:
+            stats["first_query_ms"] = round(elapsed_ms, 1)
+            stats["avg_query_ms"] = round(elapsed_ms, 1)
+        else:
+            average = stats["avg_query_ms"]
+            stats["avg_query_ms"] = round(average + (elapsed_ms - average) / (count + 1), 1)
+        stats["queries"] = count + 1
+
+def get_pool_manager(index):
+    """Return the urllib3 PoolManager behind the index's REST client, if reachable"""
+    try:
+        return index._vector_api.api_client.rest_client.pool_manager
+    except Exception:
+        # gRPC client, or an SDK version that doesn't expose the pool manager
+        return None
+
+def get_pool_stats(index):
+    """Report urllib3 connection reuse for the Pinecone index's REST client"""
+    pool_manager = get_pool_manager(index)
+    if pool_manager is None:
+        return {}
+    pool_stats = {}
+    try:
+        # Other sessions may evict pools while we iterate, so look each one up defensively
+        for key in pool_manager.pools.keys():
+            pool = pool_manager.pools.get(key)
+            if pool is None:
+                continue
+            pool_stats[pool.host] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "reused_requests": max(pool.num_requests - pool.num_connections, 0),
+            }
+    except Exception as e:
+        # Stats are best effort and must never break the chat page
+        logger.debug(f"Could not read Pinecone pool stats: {e}")
+    return pool_stats
+
 # Initialize Pinecone and Gemini
 @st.cache_resource
 def initialize_services():
     """Initialize Pinecone and Gemini services"""
     try:
+        # Initialize Gemini
+        genai.configure(api_key=GOOGLE_API_KEY, transport=GEMINI_TRANSPORT)
+        
         # Initialize Pinecone
-        pc = Pinecone(api_key=PINECONE_API_KEY)
-        index = pc.Index(INDEX_NAME)
+        stats, lock = get_connection_stats()
+        pc, index = create_pinecone_client(stats, lock)
         
-        # Initialize Gemini
-        genai.configure(api_key=GOOGLE_API_KEY)
+        # Warm up connections in the background so startup isn't blocked
+        threading.Thread(target=warm_up_connections, args=(index, stats, lock), daemon=True).start()
         
         return pc, index
     except Exception as e:
@@ -46,17 +187,44 @@ def get_query_embedding(query):
 def search_similar_chunks(index, query_embedding, top_k=5):
     """Search for similar chunks in Pinecone"""
     try:
+        start = time.perf_counter()
         search_response = index.query(
             vector=query_embedding,
             top_k=top_k,
             include_metadata=True,
             include_values=False
         )
+        record_query_latency((time.perf_counter() - start) * 1000, *get_connection_stats())
         return search_response['matches']
     except Exception as e:
         st.error(f"Error searching Pinecone: {e}")
         return []
 
+def select_relevant_chunks(matches, min_score=MIN_SCORE, max_gap=MAX_SCORE_GAP):
+    """Keep the leading matches that clear the score threshold, cutting at the first large score gap"""
+    scores = [round(match['score'], 4) for match in matches]
+    selected = []
+    previous_score = None
+    for match in matches:
+        score = match['score']
+        if score < min_score:
+            break
+        if previous_score is not None and previous_score - score > max_gap:
+            break
+        selected.append(match)
+        previous_score = score
+    logger.info(
+        "Retrieval scores=%s kept=%d/%d (min_score=%.2f, max_gap=%.2f)",
+        scores, len(selected), len(matches), min_score, max_gap
+    )
+    if matches and not selected:
+        # Surfaced above INFO so on-topic questions falling under the cutoff get noticed
+        logger.warning(
+            "No match cleared min_score=%.2f (best score=%.4f); answering without Gemini",
+            min_score, matches[0]['score']
+        )
+    return selected
+
 def generate_response(query, context_chunks):
     """Generate response using Gemini with retrieved context"""
     try:
@@ -502,23 +670,34 @@ def main():
                 
                 if query_embedding:
                     # Search for similar chunks
-                    similar_chunks = search_similar_chunks(index, query_embedding, top_k=5)
+                    similar_chunks = search_similar_chunks(index, query_embedding, top_k=MAX_TOP_K)
+                    relevant_chunks = select_relevant_chunks(similar_chunks)
                     
-                    if similar_chunks:
+                    if relevant_chunks:
                         # Generate response
-                        response = generate_response(prompt, similar_chunks)
+                        response = generate_response(prompt, relevant_chunks)
                         st.markdown(response)
                         
                         # Add assistant response to chat history
                         st.session_state.messages.append({"role": "assistant", "content": response})
                     else:
-                        error_msg = "I don't have that specific information about Soham right now. Feel free to ask me something else! ✨"
-                        st.markdown(error_msg)
-                        st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                        # Nothing relevant enough: answer without calling the LLM
+                        st.markdown(NO_CONTEXT_REPLY)
+                        st.session_state.messages.append({"role": "assistant", "content": NO_CONTEXT_REPLY})
                 else:
                     error_msg = "I'm having trouble processing your question. Could you please try rephrasing it? 🤔"
                     st.markdown(error_msg)
                     st.session_state.messages.append({"role": "assistant", "content": error_msg})
+    
+    # Connection reuse stats, drawn last so this run's query is included.
+    # They expose the index host, so only show them when an operator opts in.
+    if SHOW_CONNECTION_STATS:
+        stats, lock = get_connection_stats()
+        with lock:
+            stats_snapshot = dict(stats)
+        stats_snapshot["pools"] = get_pool_stats(index)
+        with st.sidebar.expander("Connection stats"):
+            st.json(stats_snapshot)
 
 if __name__ == "__main__":
     main()